@@ -9,32 +9,112 @@ This is the AI base class. This module contains:
 '''
 
 from abc import ABC, abstractmethod
-from snake import GameOutcome
+from snake import GameWorld, GameOutcome, SnakeVision
+
+def _bool_field(shift:int) -> property:
+    '''It returns a property accessing a bool stored at bit `shift` 
+    of `SystemState.bits`.'''
+    def getter(self) -> bool:
+        return (self.bits>>shift)&1==1
+    def setter(self, value:bool):
+        self.bits = self.bits & ~(3<<shift) | bool(value)<<shift
+    return property(getter, setter)
+
+def _int_field(shift:int) -> property:
+    '''It returns a property accessing an int of -1, 0 or +1 stored as
+    2-bit two's complement at bit `shift` of `SystemState.bits`.'''
+    def getter(self) -> int:
+        return ((self.bits>>shift)&3 ^ 2) - 2
+    def setter(self, value:int):
+        if value not in (-1,0,1):
+            raise ValueError("expected -1, 0 or +1, got %r"%(value,))
+        self.bits = self.bits & ~(3<<shift) | (value&3)<<shift
+    return property(getter, setter)
 
 class SystemState:
     '''
     It is the System State data structure carrying the one-ring vision of 
     the snake. It also indicates the food position and carries the current
     movement of the snake.
+
+    All fields are packed into a single integer `bits`, 2 bits per field,
+    and are accessed as attributes through properties. An algorithm can
+    also use `bits` directly, e.g. masking it with `NSEW_MASK` gives a key
+    to look up a table precomputed over `enumerate_nsew()`.
     '''
-    def __init__(self):
-        ## mark the position of the food relative to the snake
-        self.food_north: bool = False
-        self.food_south: bool = False
-        self.food_east: bool = False
-        self.food_west: bool = False
-        ## mark the obstacle one-ring around the snake
-        self.obj_north: int = 0
-        self.obj_south: int = 0
-        self.obj_east: int = 0
-        self.obj_west: int = 0
-        self.obj_north_east: int = 0
-        self.obj_north_west: int = 0
-        self.obj_south_east: int = 0
-        self.obj_south_west: int = 0
-        ## record the current movement of the snake
-        self.dir_x: int = 0
-        self.dir_y: int = 0
+    __slots__ = ('bits',)
+
+    ## bit position of each field in `bits`
+    _SHIFT = {name:2*i for i,name in enumerate((
+                'food_north', 'food_south', 'food_east', 'food_west',
+                'obj_north', 'obj_south', 'obj_east', 'obj_west',
+                'obj_north_east', 'obj_north_west', 
+                'obj_south_east', 'obj_south_west',
+                'dir_x', 'dir_y'))}
+
+    ## mark the position of the food relative to the snake
+    food_north = _bool_field(_SHIFT['food_north'])
+    food_south = _bool_field(_SHIFT['food_south'])
+    food_east = _bool_field(_SHIFT['food_east'])
+    food_west = _bool_field(_SHIFT['food_west'])
+    ## mark the obstacle one-ring around the snake
+    obj_north = _int_field(_SHIFT['obj_north'])
+    obj_south = _int_field(_SHIFT['obj_south'])
+    obj_east = _int_field(_SHIFT['obj_east'])
+    obj_west = _int_field(_SHIFT['obj_west'])
+    obj_north_east = _int_field(_SHIFT['obj_north_east'])
+    obj_north_west = _int_field(_SHIFT['obj_north_west'])
+    obj_south_east = _int_field(_SHIFT['obj_south_east'])
+    obj_south_west = _int_field(_SHIFT['obj_south_west'])
+    ## record the current movement of the snake
+    dir_x = _int_field(_SHIFT['dir_x'])
+    dir_y = _int_field(_SHIFT['dir_y'])
+
+    def __new__(cls, *args, **kwargs):
+        ## `bits` is set here rather than in `__init__()`, so that a 
+        ## subclass works even if its `__init__()` doesn't call 
+        ## `super().__init__()`
+        self = super().__new__(cls)
+        self.bits: int = 0 # all fields are zero/False
+        return self
+
+    @classmethod
+    def mask(cls, *fields:str) -> int:
+        '''It returns the mask selecting the given fields in `bits`.'''
+        mask = 0
+        for name in fields:
+            mask |= 3<<cls._SHIFT[name]
+        return mask
+
+    @classmethod
+    def enumerate_nsew(cls):
+        '''It generates all system states that differ in the fields
+        selected by `NSEW_MASK`, i.e. the food position, the vision in
+        the north/south/east/west and the movement (including no 
+        movement). The diagonal vision is left at zero.'''
+        for dir_x,dir_y in [(0,0),(+1,0),(-1,0),(0,+1),(0,-1)]:
+            for food in range(16):
+                for obj in range(81):
+                    state = cls()
+                    state.dir_x, state.dir_y = dir_x, dir_y
+                    state.food_north = food&1; state.food_south = food&2
+                    state.food_east = food&4;  state.food_west = food&8
+                    state.obj_north = obj%3-1;     state.obj_south = obj//3%3-1
+                    state.obj_east = obj//9%3-1;   state.obj_west = obj//27%3-1
+                    yield state
+
+## mask of the fields in `SystemState.bits` without the diagonal vision
+SystemState.NSEW_MASK = SystemState.mask(
+                'food_north', 'food_south', 'food_east', 'food_west',
+                'obj_north', 'obj_south', 'obj_east', 'obj_west',
+                'dir_x', 'dir_y')
+
+
+## offset of the location seen by each vision field from the snake's head
+_VISION_OFFSET = {'obj_north':(0,-1), 'obj_south':(0,+1),
+                  'obj_east':(+1,0), 'obj_west':(-1,0),
+                  'obj_north_east':(+1,-1), 'obj_north_west':(-1,-1),
+                  'obj_south_east':(+1,+1), 'obj_south_west':(-1,+1)}
 
 
 class DecayingFloat:
@@ -112,8 +192,15 @@ class AI_Base(ABC):
     - callback_terminating(): called when the program is just about
       to exit. The algorithm can print some final statistical info or 
       save some info before the program ends.
+
+    The subclass may set `VISION` to the vision fields of `SystemState`
+    it reads. Only those are filled by `build_state()`, the others are 
+    left at zero.
     '''
 
+    ## vision fields filled by `build_state()`, by default all of them
+    VISION = tuple(_VISION_OFFSET)
+
     def __init__(self):
         self._name = "Human Player"
         self._state: SystemState = None
@@ -146,6 +233,56 @@ class AI_Base(ABC):
                   + "-%s"%("U" if state.dir_y==-1 else "D" if state.dir_y==1 else \
                            "L" if state.dir_x==-1 else "R")
 
+    @staticmethod
+    def _look_at(game:GameWorld, x:int, y:int) -> int:
+        '''It returns what the snake sees at game location (x,y) as
+        recorded in a system state, i.e. 0 for a space, +1 for the food
+        and -1 for anything else.'''
+        obj = game.get_object_at(x,y)
+        return 0 if obj==SnakeVision.SPACE else \
+              +1 if obj==SnakeVision.FOOD  else \
+              -1
+
+    def build_state(self, game:GameWorld) -> SystemState:
+        '''Build the system state of the game world `game`. The returned
+        state is what the environment passes to `callback_take_action()`, 
+        `callback_action_outcome()` and `state_str()`.
+
+        By default, it returns a `SystemState`. A subclass may reimplement
+        this method to build its own state directly from the game world.
+
+        Parameters
+        ----------
+        game : GameWorld
+            The game world to observe.
+
+        Returns
+        -------
+        SystemState
+            The current system state of the environment.
+        '''
+        ## fill the system state accordingly
+        state = SystemState()
+        snake_x, snake_y = game.get_snake_loc()
+        food_x, food_y = game.get_food_loc()
+
+        ## 1. moving direction
+        state.dir_x, state.dir_y = game.get_direction()
+
+        ## 2. food direction
+        if food_x > snake_x:   state.food_east = True
+        elif food_x < snake_x: state.food_west = True
+        if food_y > snake_y:   state.food_south = True
+        elif food_y < snake_y: state.food_north = True
+
+        ## 3. vision around the snake (one ring vision), only the
+        ##    fields needed by the algorithm
+        for name in self.VISION:
+            x, y = _VISION_OFFSET[name]
+            setattr(state, name, self._look_at(game,snake_x+x,snake_y+y))
+
+        return state
+
     def is_keyboard_allowed(self) -> bool:
         '''Return if this AI algorithm can accept keyboard input. By 
         default, it is not allowed. So user cannot interfere with 
@@ -181,7 +318,8 @@ class AI_Base(ABC):
             x-direction (either -1,0,1 for left,none,right) and the second
             element is the y-direction (either -1,0,1 for up,none,right).
             In the rule, the snake cannot move diagonally, so at least one
-            of the element must be a zero.
+            of the element must be a zero. Any other movement, e.g. (0,0),
+            is ignored and the snake keeps its current movement.
         '''
         ## if called accidentally, it simply returns the same 
         ## movement as the previous state
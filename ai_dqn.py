@@ -12,28 +12,63 @@ The code also follows the following tutorial:
 - https://towardsdatascience.com/how-to-teach-an-ai-to-play-games-deep-reinforcement-learning-28f9b920440a
 '''
 
+import tensorflow as tf
 from tensorflow.python.client import device_lib 
 from keras.optimizers import Adam
 from keras.models import Sequential
-from keras.layers.core import Dense, Dropout
-from keras.utils import to_categorical
+from keras.layers.core import Dense
 
-## NOTE: use the following import for `Adam` and `to_categorical` instead if you encounter the following errors:
+## NOTE: use the following import for `Adam` instead if you encounter the following error:
 ##   ImportError: cannot import name 'adam' from 'keras.optimizers'
-##   ImportError: cannot import name 'to_categorical' from 'keras.optimizers'
 #from tensorflow.keras.optimizers import Adam
-#from tensorflow.keras.utils import to_categorical
 
 import random
+import functools
 import numpy as np
-import collections
 import os
+from operator import attrgetter
 
 from ai_base import SystemState, AI_Base, DecayingFloat
 from snake import GameOutcome
 
+## for each movement (dir_x,dir_y), fetch the fields of the system
+## state seen at the front/left/right of the snake, and the food
+## at the front/back/left/right of the snake
+_ROT = {
+    (+1,0): attrgetter('obj_east', 'obj_north','obj_south',  # moving east
+                       'food_east','food_west','food_north','food_south'),
+    (-1,0): attrgetter('obj_west', 'obj_south','obj_north',  # moving west
+                       'food_west','food_east','food_south','food_north'),
+    (0,+1): attrgetter('obj_south','obj_east', 'obj_west',   # moving south
+                       'food_south','food_north','food_east','food_west'),
+    (0,-1): attrgetter('obj_north','obj_west', 'obj_east',   # moving north
+                       'food_north','food_south','food_west','food_east'),
+}
+
+def _translate(state:SystemState) -> int:
+    '''It translates the system state to the 7 bits of `AI_DQN.State`
+    and returns them packed into an integer.'''
+    rot = _ROT.get((state.dir_x,state.dir_y))
+    if rot is None: return 0 # no movement, nothing to translate
+    obj_front, obj_left, obj_right, \
+        food_front, food_back, food_left, food_right = rot(state)
+    return (obj_front==-1)<<6 | (obj_left==-1)<<5 | (obj_right==-1)<<4 \
+         | food_front<<3 | food_back<<2 | food_left<<1 | food_right
+
+## the translated key of every system state, indexed by its bits 
+## masked with `SystemState.NSEW_MASK`
+_KEYS = {state.bits:_translate(state) for state in SystemState.enumerate_nsew()}
+_DIR_MASK = SystemState.mask('dir_x','dir_y')
+
 class AI_DQN(AI_Base):
 
+    ## environment parameters
+    LEN_STATE: int = 7  # number of bits in `AI_DQN.State`
+    LEN_ACTION: int = 3 # number of actions in `AI_DQN.Action`
+
+    ## the translated state only looks north/south/east/west
+    VISION = ('obj_north', 'obj_south', 'obj_east', 'obj_west')
+
     class Action:
         '''
         This is an inner class providing three possible actions, which 
@@ -43,6 +78,7 @@ class AI_DQN(AI_Base):
         FRONT = 1
         RIGHT = 2
         ALL = [LEFT, FRONT, RIGHT]
+        _ONEHOTS = np.eye(len(ALL), dtype=np.int8) # one-hot array of each action
         def __init__(self, action:int=0):
             self.action = action
         def __eq__(self, action:int) -> bool:
@@ -54,28 +90,18 @@ class AI_DQN(AI_Base):
         def get_action(self):
             return self.action
         def assign_array(self, action_array):
-            self.action = int(np.dot(action_array,self.ALL))
+            self.action = int(action_array.argmax())
         def to_array(self) -> [int]:
-            action_list = []
-            for i in range(0,len(self.ALL)):
-                action_list.append(1 if self.action==self.ALL[i] else 0)
-            return np.asarray(action_list)
+            '''It returns the one-hot array of the action. The array is
+            shared, so it must not be modified.'''
+            return self._ONEHOTS[self.action]
         def to_xy(self, x:int, y:int) -> (int,int):
             '''It translates the relative movement to the absolute movement, and 
             returns the absolute movement as a tuple. The inputs x,y are the current 
             movement which are needed for the translation.'''
-            if self.action==self.FRONT:
-                pass
-            elif self.action==self.LEFT: # left of (x,y) direction
-                if x!=0:
-                    y = -x; x = 0
-                else:
-                    x = y; y = 0
-            elif self.action==self.RIGHT: # right of (x,y) direction
-                if x!=0:
-                    y = x; x = 0
-                else:
-                    x = -y; y = 0
+            ## a left turn rotates (x,y) to (y,-x), a right turn to (-y,x)
+            if self.action==self.LEFT:  return (y,-x)
+            if self.action==self.RIGHT: return (-y,x)
             return (x,y)
 
     class State(SystemState):
@@ -86,80 +112,58 @@ class AI_DQN(AI_Base):
         relative to the movement of the snake.
         '''
         def __init__(self, other:SystemState=None):
+            super().__init__()
 
             ## translating north/east/south/west to front/back/left/right
-            ## system state now contains 7 bits
-            self.obj_front = 0
-            self.obj_left = 0
-            self.obj_right = 0
-            self.food_front = False
-            self.food_back = False
-            self.food_left = False
-            self.food_right = False
-            self.dir_x = other.dir_x if other!=None else 0
-            self.dir_y = other.dir_y if other!=None else 0
-
-            if self.dir_x==+1: # moving east
-                self.obj_front = other.obj_east==-1
-                self.obj_left = other.obj_north==-1
-                self.obj_right = other.obj_south==-1
-                self.food_front = other.food_east
-                self.food_back = other.food_west
-                self.food_left = other.food_north
-                self.food_right = other.food_south
-            elif self.dir_x==-1: # moving west
-                self.obj_front = other.obj_west==-1
-                self.obj_left = other.obj_south==-1
-                self.obj_right = other.obj_north==-1
-                self.food_front = other.food_west
-                self.food_back = other.food_east
-                self.food_left = other.food_south
-                self.food_right = other.food_north
-            elif self.dir_y==+1: # moving south
-                self.obj_front = other.obj_south==-1
-                self.obj_left = other.obj_east==-1
-                self.obj_right = other.obj_west==-1
-                self.food_front = other.food_south
-                self.food_back = other.food_north
-                self.food_left = other.food_east
-                self.food_right = other.food_west
-            elif self.dir_y==-1: # moving north
-                self.obj_front = other.obj_north==-1
-                self.obj_left = other.obj_west==-1
-                self.obj_right = other.obj_east==-1
-                self.food_front = other.food_north
-                self.food_back = other.food_south
-                self.food_left = other.food_west
-                self.food_right = other.food_east
-
-        def _test(self, test:bool) -> int:
-            '''It translates bool to int, 1 for True, 0 otherwise.'''
-            return 1 if test else 0
-
-        def to_array(self):
-            state_list = [
-                self._test(self.obj_front),
-                self._test(self.obj_left),
-                self._test(self.obj_right),
-                self._test(self.food_front),
-                self._test(self.food_back),
-                self._test(self.food_left),
-                self._test(self.food_right),
+            ## system state now contains 7 bits, the translation is looked
+            ## up from the bits of the system state
+            key = 0
+            if other is not None:
+                self.bits = other.bits & _DIR_MASK # keep the movement
+                key = _KEYS[other.bits & SystemState.NSEW_MASK]
+            self.obj_front = key>>6&1
+            self.obj_left = key>>5&1
+            self.obj_right = key>>4&1
+            self.food_front = key>>3&1
+            self.food_back = key>>2&1
+            self.food_left = key>>1&1
+            self.food_right = key&1
+
+            ## the 7 bits packed into an integer, it identifies the state
+            self._key = key
+
+        def to_array(self, out=None):
+            '''It returns the 7 bits of the state as an array. If `out` is
+            given, the bits are written into it in place and it is returned,
+            so that no new array is allocated.'''
+            if out is None: out = np.empty(7, np.int8)
+            out[:] = (
+                self.obj_front,
+                self.obj_left,
+                self.obj_right,
+                self.food_front,
+                self.food_back,
+                self.food_left,
+                self.food_right,
                 ## the following were used in the original tutorial
                 ## but they look redundant, so removed
-                #self._test(self.dir_x==+1),
-                #self._test(self.dir_x==-1),
-                #self._test(self.dir_y==+1),
-                #self._test(self.dir_y==-1)
-            ]
-            return np.asarray(state_list)
+                #self.dir_x==+1,
+                #self.dir_x==-1,
+                #self.dir_y==+1,
+                #self.dir_y==-1
+            )
+            return out
+
+        def to_key(self) -> int:
+            '''It returns the 7 bits of the state packed into an integer.'''
+            return self._key
 
         def __eq__(self, other):
-            return isinstance(other, SystemState) and str(self)==str(other)
+            return isinstance(other, AI_DQN.State) and self._key==other._key
         def __hash__(self):
-            return hash(str(self))
+            return self._key
         def __str__(self):
-            return str(self.to_array())
+            return format(self._key, '07b')
 
     def _build_model1(self, input:int, output:int):
         '''This model is used in the original tutorial. It is quite
@@ -168,7 +172,7 @@ class AI_DQN(AI_Base):
         model.add(Dense(50,  activation='relu', input_dim=input))
         model.add(Dense(300, activation='relu'))
         model.add(Dense(50,  activation='relu'))
-        model.add(Dense(output, activation='softmax'))
+        model.add(Dense(output, activation='linear', dtype='float32'))
         model.compile(loss='mse', optimizer=Adam(self.learning_rate))
         return model 
 
@@ -178,7 +182,7 @@ class AI_DQN(AI_Base):
         model.add(Dense(30, activation='relu', input_dim=input))
         model.add(Dense(80, activation='relu'))
         model.add(Dense(30, activation='relu'))
-        model.add(Dense(output, activation='softmax'))
+        model.add(Dense(output, activation='linear', dtype='float32'))
         model.compile(loss='mse', optimizer=Adam(self.learning_rate))
         return model
 
@@ -186,20 +190,43 @@ class AI_DQN(AI_Base):
         '''Default constructor.'''
         super().__init__()
         self._name = "DQN " + ("" if training_mode else "(testing mode)")
-        print(device_lib.list_local_devices()) # check if you have a GPU
-
-        ## environment parameters
-        self.len_action = len(self.Action().to_array())
-        self.len_state = len(self.State().to_array())
+        if os.environ.get('DQN_DEBUG'): # set DQN_DEBUG to check if you have a GPU
+            print(device_lib.list_local_devices())
 
         ## learning related hyperparameters
         self.learning_rate: float = 0.0005
         self.gamma: float = 0.9      # discount factor
-        self.memory = collections.deque(maxlen=2500)
+        self.memory_size: int = 2500 # max number of steps to remember
         self.batch_size: int = 1000  # max number for training
 
+        ## replay memory: a ring buffer kept as one array per field
+        ## (state, next state, action, reward, done), `_idx` is where
+        ## the next record goes and `_full` tells if it has wrapped around
+        self._s = np.zeros((self.memory_size, self.LEN_STATE), np.float32)
+        self._s1 = np.zeros_like(self._s)
+        self._a = np.zeros(self.memory_size, np.int8)
+        self._r = np.zeros(self.memory_size, np.float32)
+        self._d = np.zeros(self.memory_size, np.bool_)
+        self._idx: int = 0
+        self._full: bool = False
+
+        ## input buffer for a single prediction, calling the model directly
+        ## on it is much cheaper than `model.predict()` for one sample
+        self._infer_buf = np.empty((1, self.LEN_STATE), np.float32)
+        self._pair_buf = np.empty((2, self.LEN_STATE), np.float32) # (state, next state)
+
+        ## the network is tiny, half precision only pays off on a GPU, 
+        ## on a CPU it is slower than float32; the GPU is probed here 
+        ## rather than on import, so other algorithms don't pay for it
+        if tf.config.list_physical_devices('GPU'):
+            tf.keras.mixed_precision.set_global_policy('mixed_float16')
+
         ## build a neural newtork model
-        self.model = self._build_model2(self.len_state, self.len_action)
+        self.model = self._build_model2(self.LEN_STATE, self.LEN_ACTION)
+
+        ## XLA-compiled forward pass, used for predictions during the game
+        self._forward = tf.function(lambda x: self.model(x, training=False),
+                                    jit_compile=True)
 
         ## episode related hyperparameters
         ## note: our programming control flow is environment oriented,
@@ -232,6 +259,20 @@ class AI_DQN(AI_Base):
         ## load weights
         self.load_weights()
 
+        ## there are only 2^7 possible states, so predictions are cached
+        ## by the state key and the cache is cleared whenever the model
+        ## is trained
+        self._predict = functools.lru_cache(maxsize=2**self.LEN_STATE)(self._predict)
+
+        ## warm up, the first calls trace & compile the forward pass which
+        ## takes a while, do it now for both input shapes used in the game
+        ## rather than stalling the first game ticks; the model is not 
+        ## trained here
+        self._infer_buf[:] = 0
+        self._pair_buf[:] = 0
+        self._forward(self._infer_buf)
+        self._forward(self._pair_buf)
+
     def load_weights(self):
         '''Load weights from `weights-learned.hdf5`. This is used internally.'''
         filename_weights = "weights-learned.hdf5"
@@ -259,39 +300,67 @@ class AI_DQN(AI_Base):
         return str(self.State(state))
 
     def remember(self, state, action, reward, next_state, done):
-        '''Store the system evolution to the memory.'''
-        self.memory.append((state, action, reward, next_state, done))
+        '''Store the system evolution to the memory. The states are
+        `AI_DQN.State` instances and the action is an action index.'''
+        i = self._idx
+        state.to_array(out=self._s[i])
+        self._a[i] = action
+        self._r[i] = reward
+        next_state.to_array(out=self._s1[i])
+        self._d[i] = done
+        self._idx = (i+1) % self.memory_size
+        if self._idx==0: self._full = True
+
+    def _predict(self, key:int):
+        '''It returns the Q-values predicted by the model for a state
+        given by its key, see `State.to_key()`.'''
+        for i in range(self.LEN_STATE):
+            self._infer_buf[0,i] = (key >> (self.LEN_STATE-1-i)) & 1
+        return self._forward(self._infer_buf).numpy()[0]
 
     def replay(self):
         '''Replay the memory, this is where the main training happens.'''
 
-        ## limit memory to the 'batch_size'
-        if len(self.memory) > self.batch_size:
-            minibatch = random.sample(self.memory, self.batch_size)
-        else:
-            minibatch = self.memory
-
-        ## iterate the memory one-by-one to train the model
-        for state, action, reward, next_state, done in minibatch:
-            target = reward
-            if not done:
-                target = reward + self.gamma * np.amax(self.model.predict(np.array([next_state]))[0])
-            target_f = self.model.predict(np.array([state]))
-            target_f[0][np.argmax(action)] = target
-            self.model.fit(np.array([state]), target_f, epochs=1, verbose=0)
+        ## limit memory to the 'batch_size', the minibatch is sampled
+        ## with replacement which is the usual practice in DQN
+        n = self.memory_size if self._full else self._idx
+        if n==0: return # nothing to learn
+        ids = np.random.randint(0, n, size=min(n, self.batch_size))
+
+        ## gather the minibatch from the memory, the whole minibatch
+        ## is trained in one go rather than one sample at a time
+        states = self._s[ids]
+        actions = self._a[ids]
+        rewards = self._r[ids]
+        next_states = self._s1[ids]
+        dones = self._d[ids].astype(np.float32)
+
+        ## target = reward for the last step of an episode, otherwise
+        ## target = reward + gamma * max_a(Q(next_state,a))
+        n = len(ids)
+        q_next = self.model.predict(next_states, batch_size=n, verbose=0)
+        targets = self.model.predict(states, batch_size=n, verbose=0)
+        targets[np.arange(n), actions] = rewards \
+                    + self.gamma * np.max(q_next, axis=1) * (1 - dones)
+        self.model.train_on_batch(states, targets)
+        self._predict.cache_clear() # the model has changed
 
         ## clear the trained memory to avoid duplicate training
-        self.memory.clear()
+        self._idx = 0
+        self._full = False
 
     def train_short_memory(self, state, action, reward, next_state, done):
-        '''Train the model with a single data point.'''
-        array_shape = (1, self.len_state)
-        target = reward
-        if not done:
-            target = reward + self.gamma * np.amax(self.model.predict(next_state.reshape(array_shape))[0])
-        target_f = self.model.predict(state.reshape(array_shape))
-        target_f[0][np.argmax(action)] = target
-        self.model.fit(state.reshape(array_shape), target_f, epochs=1, verbose=0)
+        '''Train the model with a single data point. The states are
+        `AI_DQN.State` instances and the action is an action index.'''
+        ## predict both states in one call
+        state.to_array(out=self._pair_buf[0])
+        next_state.to_array(out=self._pair_buf[1])
+        q = self._forward(self._pair_buf).numpy()
+        target_f, q_next = q[0:1], q[1]
+        target_f[0, action] = reward \
+                    + (0 if done else self.gamma * np.max(q_next))
+        self.model.train_on_batch(self._pair_buf[0:1], target_f)
+        self._predict.cache_clear() # the model has changed
     
     def callback_take_action(self, state:SystemState) -> (int,int):
         '''Here we implement the exploration-exploitation.
@@ -306,18 +375,15 @@ class AI_DQN(AI_Base):
 
         ## step 1: choose action 'a' based on the system state
         ## exploration or explotation?
-        if random.uniform(0,1) < float(self.epsilon):
+        if random.random() < self.epsilon.value:
             ## exploration: pick a random action
-            chosen_action = to_categorical(random.randint(0,self.len_action-1), 
-                                           num_classes=self.len_action)
+            chosen_idx = random.randrange(self.LEN_ACTION)
         else:
             ## exploitation: choose based on model prediction
-            prediction = self.model.predict(s.to_array().reshape((1, self.len_state)))
-            chosen_action = to_categorical(np.argmax(prediction[0]), 
-                                           num_classes=self.len_action)
+            prediction = self._predict(s.to_key())
+            chosen_idx = int(np.argmax(prediction))
 
-        a = self.Action()
-        a.assign_array(chosen_action)
+        a = self.Action(chosen_idx)
         self.current_action = a # keep the action
 
         ## step 2:
@@ -334,11 +400,12 @@ class AI_DQN(AI_Base):
 
         ## ...continuing from 'callback_take_action()'
         ## retrieve: state, action -> next_state
-        ## in DQN, state & action are presented as an array
-        ## and .to_array() method will do the job
-        s = self.current_state.to_array()   # was the state before our action
-        a = self.current_action.to_array()  # was our action FRONT/LEFT/RIGHT
-        s1 = self.State(state).to_array()   # is the state after our action
+        ## in DQN, states are presented as an array and are written
+        ## straight into the memory by .remember() using .to_array(),
+        ## the action is kept as its index
+        s = self.current_state                # was the state before our action
+        a = self.current_action.get_action()  # was our action FRONT/LEFT/RIGHT
+        s1 = self.State(state)                # is the state after our action
         done = False
 
         ## step 3: calculate the reward
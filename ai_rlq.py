@@ -33,6 +33,9 @@ class AI_RLQ(AI_Base):
         the established Q-table and won't perform any update to the Q-table.
     '''
 
+    ## the translated state only looks north/south/east/west
+    VISION = ('obj_north', 'obj_south', 'obj_east', 'obj_west')
+
     class Action:
         '''
         This is an inner class providing three possible actions, which 
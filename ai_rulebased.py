@@ -16,11 +16,43 @@ for the snake. The policy is simple:
 from snake import GameOutcome
 from ai_base import SystemState, AI_Base
 
+def _policy(state:SystemState) -> (int,int):
+    '''This is the rule-based policy described above. It returns the
+    movement for the given system state.'''
+    BLOCKED = -1 # define constants here for better code readability
+    EAST = (+1,0); WEST = (-1,0)
+    NORTH = (0,-1); SOUTH = (0,+1)
+    movement = (state.dir_x,state.dir_y)
+
+    if state.food_north and state.obj_north!=BLOCKED:   movement = NORTH 
+    elif state.food_south and state.obj_south!=BLOCKED: movement = SOUTH 
+    elif state.food_east and state.obj_east!=BLOCKED:   movement = EAST 
+    elif state.food_west and state.obj_west!=BLOCKED:   movement = WEST
+    else: # the following is where the snake can't move towards
+          # the food & has to go around
+        if state.dir_x!=0: # for east/west movement
+            if state.obj_north!=BLOCKED:    movement = NORTH 
+            elif state.obj_south!=BLOCKED:  movement = SOUTH 
+        elif state.dir_y!=0: # for north/south movement
+            if state.obj_east!=BLOCKED:     movement = EAST 
+            elif state.obj_west!=BLOCKED:   movement = WEST 
+        else: pass # by passing, the snake will continue its current movement
+    return movement
+
 class AI_RuleBased(AI_Base):
     '''
-    This is the implementation of the rule-based algorithm.
+    This is the implementation of the rule-based algorithm. The policy
+    is evaluated for all possible system states in advance, so that
+    taking an action is a single table lookup.
     '''
 
+    ## the policy only looks north/south/east/west
+    VISION = ('obj_north', 'obj_south', 'obj_east', 'obj_west')
+
+    ## movement for each system state, indexed by its bits masked
+    ## with `SystemState.NSEW_MASK`
+    _LUT = {state.bits:_policy(state) for state in SystemState.enumerate_nsew()}
+
     def __init__(self):
         super().__init__()
         self._name = "Rule-based algorithm"
@@ -28,25 +60,7 @@ class AI_RuleBased(AI_Base):
     def callback_take_action(self, state:SystemState) -> (int,int):
         '''Here we implement the rule-based algorithm based on the 
         described policy.'''
-        BLOCKED = -1 # define constants here for better code readability
-        EAST = (+1,0); WEST = (-1,0)
-        NORTH = (0,-1); SOUTH = (0,+1)
-        movement = (state.dir_x,state.dir_y)
-
-        if state.food_north and state.obj_north is not BLOCKED:   movement = NORTH 
-        elif state.food_south and state.obj_south is not BLOCKED: movement = SOUTH 
-        elif state.food_east and state.obj_east is not BLOCKED:   movement = EAST 
-        elif state.food_west and state.obj_west is not BLOCKED:   movement = WEST
-        else: # the following is where the snake can't move towards
-              # the food & has to go around
-            if state.dir_x!=0: # for east/west movement
-                if state.obj_north is not BLOCKED:    movement = NORTH 
-                elif state.obj_south is not BLOCKED:  movement = SOUTH 
-            elif state.dir_y!=0: # for north/south movement
-                if state.obj_east is not BLOCKED:     movement = EAST 
-                elif state.obj_west is not BLOCKED:   movement = WEST 
-            else: pass # by passing, the snake will continue its current movement
-        return movement
+        return self._LUT[state.bits & SystemState.NSEW_MASK]
 
     def callback_action_outcome(self, state:SystemState, outcome:GameOutcome):
         '''For this implementation, the rule-based algorithm is static. 
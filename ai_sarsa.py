@@ -7,22 +7,39 @@ import numpy as np
 import random
 import json
 import os
+import re
+from operator import attrgetter
 
 from ai_base import SystemState, AI_Base
-from snake import GameOutcome
+from snake import GameWorld, GameOutcome
+
+## the four movements (dx,dy) of the snake, the index is the heading
+_HEADINGS = ((+1,0), (0,+1), (-1,0), (0,-1)) # east, south, west, north
+_HEADING = {movement:heading for heading,movement in enumerate(_HEADINGS)}
+## _DELTA[heading][action] is the movement after taking the action, a left
+## turn rotates (x,y) to (y,-x), a right turn to (-y,x)
+_DELTA = tuple(((y,-x),(x,y),(-y,x)) for x,y in _HEADINGS) # LEFT,FRONT,RIGHT
+
+def _sarsa_update(q:memoryview, sk:int, a:int, s1k:int, a1:int,
+                  reward:float, alpha:float, gamma:float):
+    '''It performs the SARSA update of `q[sk,a]` in place. `q` is a 
+    memoryview of the Q-table, so the values are plain floats rather 
+    than NumPy scalars.'''
+    q[sk,a] += alpha * (reward + gamma*q[s1k,a1] - q[sk,a])
 
 class AI_SARSA(AI_Base):
     '''
     This is the implementation of the Reinforcement Learning algorithm.
     It uses state-action-reward-state-action (SARSA) technique.
-    At the beginning, the algorithm will look for `sarsa-learned.json`
-    file which contains the learned Q-table for sarsa. 
+    At the beginning, the algorithm will look for `sarsa-learned.npz`
+    (or `sarsa-learned.json` from earlier versions) file which contains 
+    the learned Q-table for sarsa. 
     If it is found, the algorithm will load and initialize its Q-table 
     based on the data stored in the file. If it is not found, 
     the algorithm will initialize an empty Q-table.
 
     When termination signal is received, the algorithm will store its
-    Q-table in a JSON file named `sarsa.json`.
+    Q-table in a NumPy file named `sarsa.npz`.
 
     The constructor takes one input parameter.
 
@@ -53,23 +70,11 @@ class AI_SARSA(AI_Base):
             self.action = action
         def get_action(self):
             return self.action
-        def to_xy(self, x:int, y:int) -> (int,int):
+        def to_xy(self, heading:int) -> (int,int):
             '''It translates the relative movement to the absolute movement, and 
-            returns the absolute movement as a tuple. The inputs x,y are the current 
-            movement which are needed for the translation.'''
-            if self.action==self.FRONT:
-                pass
-            elif self.action==self.LEFT: # left of (x,y) direction
-                if x!=0:
-                    y = -x; x = 0
-                else:
-                    x = y; y = 0
-            elif self.action==self.RIGHT: # right of (x,y) direction
-                if x!=0:
-                    y = x; x = 0
-                else:
-                    x = -y; y = 0
-            return (x,y)
+            returns the absolute movement as a tuple. The input is the heading
+            of the current movement which is needed for the translation.'''
+            return _DELTA[heading][self.action]
 
     ## system state: inheriting from SystemState class
     ## but translate to relative to the movement of the snake
@@ -80,57 +85,85 @@ class AI_SARSA(AI_Base):
         the environment to a relative direction (front/back/left/right), 
         relative to the movement of the snake.
         '''
-        def __init__(self, other:SystemState):
-
-            ## translating north/east/south/west to front/back/left/right
-            self.obj_front = None
-            self.obj_left = None
-            self.obj_right = None
-            self.food_front = None
-            self.food_back = None
-            self.food_left = None
-            self.food_right = None
-            self.dir_x = other.dir_x
-            self.dir_y = other.dir_y
-
-            if other.dir_x==+1: # moving east
-                self.obj_front = other.obj_east
-                self.obj_left = other.obj_north
-                self.obj_right = other.obj_south
-                self.food_front = other.food_east
-                self.food_back = other.food_west
-                self.food_left = other.food_north
-                self.food_right = other.food_south
-            elif other.dir_x==-1: # moving west
-                self.obj_front = other.obj_west
-                self.obj_left = other.obj_south
-                self.obj_right = other.obj_north
-                self.food_front = other.food_west
-                self.food_back = other.food_east
-                self.food_left = other.food_south
-                self.food_right = other.food_north
-            elif other.dir_y==+1: # moving south
-                self.obj_front = other.obj_south
-                self.obj_left = other.obj_east
-                self.obj_right = other.obj_west
-                self.food_front = other.food_south
-                self.food_back = other.food_north
-                self.food_left = other.food_east
-                self.food_right = other.food_west
-            elif other.dir_y==-1: # moving north
-                self.obj_front = other.obj_north
-                self.obj_left = other.obj_west
-                self.obj_right = other.obj_east
-                self.food_front = other.food_north
-                self.food_back = other.food_south
-                self.food_left = other.food_west
-                self.food_right = other.food_east
+        ## the movement is kept as a heading, see `_HEADINGS`
+        __slots__ = ('heading', 'obj_front', 'obj_left', 'obj_right',
+                     'food_front', 'food_back', 'food_left', 'food_right',
+                     'key')
+
+        ## for each heading, the fields of the system state giving
+        ## obj front/left/right and food front/back/left/right
+        _PERM = tuple(attrgetter(*names) for names in (
+            ('obj_east','obj_north','obj_south',   # moving east
+             'food_east','food_west','food_north','food_south'),
+            ('obj_south','obj_east','obj_west',    # moving south
+             'food_south','food_north','food_east','food_west'),
+            ('obj_west','obj_south','obj_north',   # moving west
+             'food_west','food_east','food_south','food_north'),
+            ('obj_north','obj_west','obj_east',    # moving north
+             'food_north','food_south','food_west','food_east'),
+            ))
+
+        ## the movement of the system state, derived from the heading
+        dir_x = property(lambda self: _HEADINGS[self.heading][0])
+        dir_y = property(lambda self: _HEADINGS[self.heading][1])
+
+        ## number of distinct keys, see `key` below
+        NUM_KEYS = 1<<10
+
+        def __init__(self, other:SystemState=None):
+            if other is not None:
+                ## translating north/east/south/west to front/back/left/right
+                heading = _HEADING[(other.dir_x,other.dir_y)]
+                self.set_relative(heading, *self._PERM[heading](other))
+
+        def set_relative(self, heading:int,
+                         obj_front:int, obj_left:int, obj_right:int,
+                         food_front:bool, food_back:bool, 
+                         food_left:bool, food_right:bool):
+            '''It sets the heading and the relative vision of the state.'''
+            self.heading = heading
+            self.obj_front = obj_front
+            self.obj_left = obj_left
+            self.obj_right = obj_right
+            self.food_front = food_front
+            self.food_back = food_back
+            self.food_left = food_left
+            self.food_right = food_right
+
+            ## the state packed into an integer, it is the Q-table key:
+            ## bit 0-3 for food left/front/right/back and 2 bits each for
+            ## obj left/front/right (stored as -1,0,+1 -> 0,1,2)
+            self.key = self.food_left | self.food_front<<1 \
+                     | self.food_right<<2 | self.food_back<<3 \
+                     | (self.obj_left+1)<<4 | (self.obj_front+1)<<6 \
+                     | (self.obj_right+1)<<8
+
+        ## the format of `__str__()`, which is also the key of the 
+        ## Q-table saved by earlier versions in `sarsa-learned.json`
+        _STR_FORMAT = re.compile(r"\[([< ])([\^ ])([> ])([v ])\],"
+                                 r"\[([+-][01]),([+-][01]),([+-][01])\]$")
+
+        @classmethod
+        def from_str(cls, text:str) -> 'AI_SARSA.State':
+            '''It returns the state whose `__str__()` is `text`, moving 
+            east as the heading isn't in the string. It returns None if 
+            `text` isn't in that format.'''
+            match = cls._STR_FORMAT.match(text)
+            if match is None: return None
+            left, front, right, back, obj_left, obj_front, obj_right \
+                = match.groups()
+            state = cls()
+            state.set_relative(0, int(obj_front), int(obj_left), 
+                               int(obj_right), front=="^", back=="v", 
+                               left=="<", right==">")
+            return state
 
         def __eq__(self, other):
-            return isinstance(other, SystemState) and str(self)==str(other)
+            return isinstance(other, type(self)) and self.key==other.key
         def __hash__(self):
-            return hash(str(self))
+            return self.key
         def __str__(self):
+            ## only used by the debugging window
             return "["+("<" if self.food_left else " ") \
                       +("^" if self.food_front else " ") \
                       +(">" if self.food_right else " ") \
@@ -173,8 +206,11 @@ class AI_SARSA(AI_Base):
         self.food_reward: int = 10   # reward for getting the snake to eat the food
         self.crash_reward: int = -10 # negative reward for being crashed
 
-        ## Q-table: q_table[s:State][a:Action] it is a dict
-        self.q_table = dict()
+        ## Q-table: q_table[s.key,a:Action] it is a 2-D array with a row 
+        ## for every possible state, `seen` marks the rows already visited
+        self.q_table = np.zeros((self.State.NUM_KEYS,len(self.Action.ALL)))
+        self.seen = np.zeros(self.State.NUM_KEYS, dtype=bool)
+        self._q_view = memoryview(self.q_table) # for scalar access
 
         ## current/next state & action
         self.current_state = None
@@ -187,34 +223,40 @@ class AI_SARSA(AI_Base):
 
 
     def load_table(self):
-        '''Load Q-table from `sarsa-learned.json`. This is used internally.'''
-        filename_q_table = "sarsa-learned.json"
+        '''Load Q-table from `sarsa-learned.npz`, or from `sarsa-learned.json`
+        saved by earlier versions. This is used internally.'''
+        filename_q_table = "sarsa-learned.npz"
         if os.path.exists(filename_q_table):
+            with np.load(filename_q_table) as data:
+                self.q_table[:] = data["q_table"]
+                self.seen[:] = data["seen"]
+        elif os.path.exists("sarsa-learned.json"):
+            ## earlier versions kept a dict of {str(state):row} for seen
+            ## states, see `AI_SARSA.State.from_str()`
+            filename_q_table = "sarsa-learned.json"
             with open(filename_q_table, "r") as fp:
-                self.q_table = json.load(fp)
-            if len(self.q_table)!=0:
-                print("- loaded '%s' which contains %d states"
-                            %(filename_q_table,len(self.q_table)))
+                table = json.load(fp)
+            for k,v in table.items():
+                state = self.State.from_str(k)
+                if state is None:
+                    print("- skipped unrecognized state '%s' in '%s'"
+                                %(k,filename_q_table))
+                    continue
+                self.q_table[state.key] = v
+                self.seen[state.key] = True
         else:
             print("- '%s' not found, no experience is used"%filename_q_table)
+            return
+        if self.seen.any():
+            print("- loaded '%s' which contains %d states"
+                        %(filename_q_table,np.count_nonzero(self.seen)))
 
     def save_table(self):
-        '''Save Q-table to `sarsa.json`. This is used internally.'''
-        class NpEncoder(json.JSONEncoder):
-            def default(self, obj):
-                if isinstance(obj, np.integer):
-                    return int(obj)
-                elif isinstance(obj, np.floating):
-                    return float(obj)
-                elif isinstance(obj, np.ndarray):
-                    return obj.tolist()
-                else:
-                    return super(NpEncoder, self).default(obj)
-
-        ## write Q-Table to the json file
+        '''Save Q-table to `sarsa.npz`. This is used internally.'''
+        ## write Q-Table to the npz file
         ## this way, we don't lose the training data
-        with open("sarsa.json", "w") as fp:
-            json.dump(self.q_table, fp, cls=NpEncoder, indent=4)
+        with open("sarsa.npz", "wb") as fp:
+            np.savez_compressed(fp, q_table=self.q_table, seen=self.seen)
 
     def state_str(self, state:SystemState) -> str:
         '''It returns the string representation of the system state 
@@ -226,7 +268,38 @@ class AI_SARSA(AI_Base):
         str
             The string representation of the translated system state.
         '''
-        return str(self.State(state))
+        return str(self._translate(state))
+
+    def _translate(self, state:SystemState):
+        '''It returns `state` as an `AI_SARSA.State`, translating it only
+        if it is not one yet.'''
+        return state if isinstance(state, self.State) else self.State(state)
+
+    def build_state(self, game:GameWorld) -> 'AI_SARSA.State':
+        '''It builds the translated system state directly from the game 
+        world, looking only at the front, left and right of the snake.
+
+        Returns
+        -------
+        AI_SARSA.State
+            The translated system state.
+        '''
+        x, y = game.get_snake_loc()
+        food_x, food_y = game.get_food_loc()
+        dx, dy = game.get_direction()
+
+        ## food ahead/left of the snake: project the food offset onto the
+        ## movement (dx,dy) and onto its left-hand direction (dy,-dx)
+        front = (food_x-x)*dx + (food_y-y)*dy
+        left = (food_x-x)*dy - (food_y-y)*dx
+
+        state = self.State()
+        state.set_relative(_HEADING[(dx,dy)],
+                           self._look_at(game,x+dx,y+dy), # front
+                           self._look_at(game,x+dy,y-dx), # left
+                           self._look_at(game,x-dy,y+dx), # right
+                           front>0, front<0, left>0, left<0)
+        return state
 
     ## helper function, easy access to the Q-table
     def q(self, state):
@@ -235,38 +308,31 @@ class AI_SARSA(AI_Base):
 
         Parameters
         ----------
-        state : AI_RLQ.State
+        state : AI_SARSA.State
             The translated system state instance.
         '''
-        s = str(state) # we use str to index Q-table, easier to debug
-        if s not in self.q_table:
-            ## create a row for this new state in Q-table
-            self.q_table[s] = np.zeros(len(self.Action.ALL))
+        s = state.key # we use the packed integer to index Q-table
+        self.seen[s] = True
         return self.q_table[s]
 
-    def _decide_action(self, state:SystemState):
-        '''Given a state, the ML agent decides what action to
+    def _decide_action(self, s:'AI_SARSA.State'):
+        '''Given a translated state, the ML agent decides what action to
         take. This depends on whether to do exploration or 
-        exploitation. 
-        It returns the decided `Action` object.'''
+        exploitation. It returns the decided `Action` object.'''
 
-        s = self.State(state)
         a = self.Action()
-        possible_actions = []
 
-        if random.uniform(0, 1) < self.epsilon:
-            ## exploration: include all actions
-            possible_actions = self.Action.ALL.copy()
-        else:
-            ## exploitation: limit to the choice based on optimal policy
-            ## may have multiple same max value
-            ## ie. pi_star(s) = argmax_a(Q_star(s,a))
-            max_value = np.max(self.q(s)) # find the max value first
-            for i in self.Action.ALL:
-                if self.q(s)[i]==max_value:
-                    possible_actions.append(i) # add all carrying max value
-
-        a.set_action(random.choice(possible_actions))
+        if random.random() < self.epsilon:
+            ## exploration: pick any action
+            a.set_action(random.randint(0, len(self.Action.ALL)-1))
+            return a
+
+        ## exploitation: limit to the choice based on optimal policy
+        ## may have multiple same max value, pick one of them
+        ## ie. pi_star(s) = argmax_a(Q_star(s,a))
+        qs = self.q(s).tolist() # plain floats, cheaper than NumPy for 3 values
+        max_value = max(qs)
+        a.set_action(random.choice([i for i,v in enumerate(qs) if v==max_value]))
         return a
 
     def callback_take_action(self, state:SystemState) -> (int,int):
@@ -275,16 +341,17 @@ class AI_SARSA(AI_Base):
         stored in `self.next_action`. Here, we only need to return
         the already decided next action.'''
 
+        ## keep current (s,a)
+        s = self._translate(state)
+        self.current_state = s  # keep the state
+
         ## first time without `next_action`?
         if self.next_action is None:
-            self.next_action = self._decide_action(state)
+            self.next_action = self._decide_action(s)
 
-        ## keep current (s,a)
-        s = self.State(state)
-        self.current_state = s  # keep the state
         a = self.next_action
         self.current_action = a # take the next_action & execute it
-        return a.to_xy(s.dir_x,s.dir_y)
+        return a.to_xy(s.heading)
 
     def callback_action_outcome(self, state:SystemState, outcome:GameOutcome):
         '''Here we implement the update of Q-table based on the outcome.
@@ -295,10 +362,10 @@ class AI_SARSA(AI_Base):
         ## retrieve: state, action -> next_state
         s  = self.current_state      # was the state before our action
         a  = self.current_action     # was our action FRONT/LEFT/RIGHT
-        s1 = self.State(state)       # is the state after our action
+        s1 = self._translate(state)  # is the state after our action
 
         ## decide next action
-        a1 = self._decide_action(state) # is the next action
+        a1 = self._decide_action(s1) # is the next action
         self.next_action = a1
 
         ## step 3: calculate the reward
@@ -319,8 +386,9 @@ class AI_SARSA(AI_Base):
         if self.training_mode:
             a = int(a)   # 'a' needs to be an integer now to index the Q-table
             a1 = int(a1) # 'a1' needs to be an integer now to index the Q-table
-            self.q(s)[a] = self.q(s)[a] \
-                 + self.alpha * (reward + self.gamma*self.q(s1)[a1] - self.q(s)[a])
+            self.seen[s.key] = self.seen[s1.key] = True
+            _sarsa_update(self._q_view, s.key, a, s1.key, a1, 
+                          reward, self.alpha, self.gamma)
         
     def callback_terminating(self):
         '''This is a listener listening to the termination signal. When triggered,
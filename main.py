@@ -25,6 +25,14 @@ from ai_rlq import AI_RLQ
 from ai_sarsa import AI_SARSA
 from ai_dqn import AI_DQN
 
+## characters showing the snake's vision on the debugging window
+_OBJ_CHARS = { SnakeVision.WALL : "W", \
+               SnakeVision.FOOD : "o", \
+               SnakeVision.BODY : "S", \
+               SnakeVision.HEAD : "H", \
+               SnakeVision.SPACE : " ", \
+               SnakeVision.OUTOFSCOPE : " " }
+
 class MainApp:
     '''
     This is the main application. It creates an environment for AI to
@@ -46,6 +54,7 @@ class MainApp:
       the raw event to other relevant listeners.
     - on_key_event(): called when a key is pressed or released.
     - on_paint(): called when the frame requires an update on the screen.
+    - on_crash(): called when the snake crashed, it starts the next round.
     - on_exit(): called when a user requested to exit the application.
     - tk_callback_quit(): called when `tk` receives a close window from the user.
     '''
@@ -63,36 +72,47 @@ class MainApp:
         self._gui_mode: bool = not args.nodisplay # allowing GUI?
         self._snake_game = GameWorld(15,20)  # setup the width & height of the world
         self._surface: Surface # hold a surface for drawing
+        self._state_cache: SystemState = None # the last built system state
+        self._state_step: int = -1 # the game step of `_state_cache`
 
         ## fps elements
         self._game_frame: int = 0
         self._game_fps: float = 0
         self._game_ticks: float = 0
         self._game_default_fps: int = 120
+        self._game_paused: bool = True # pause status at the last frame
 
         ## tk elements
-        self._tk_root = tk.Tk()
+        self._tk_root: tk.Tk = None # only created in GUI mode
         self._text: tk.Text
+        self._tk_update_ms: int = 200 # refresh period of the tk widget
+        self._tk_next_ticks: int = 0
 
         ## main loop control elements
         self._running: bool = True
         self._user_quitting: bool = False
-        self._clock = pygame.time.Clock()
+        self._clock: pygame.time.Clock = None # only created in GUI mode
  
     def tk_callback_quit(self):
         self._user_quitting = True
 
     def on_init(self):
-        ## initialize pygame engine
-        pygame.init()
-        pygame.display.set_caption("Let's play Snake!")
-        pygame.time.set_timer(pygame.USEREVENT, self._speed, True)
-
         ## GUI display option
         if self._gui_mode:
+            ## the tk root for debugging, created before pygame sets up
+            ## its window as creating it afterwards may hang on macOS
+            self._tk_root = tk.Tk()
+
+            ## initialize pygame engine, the timer drives the game
+            pygame.init()
+            pygame.display.set_caption("Let's play Snake!")
+            pygame.time.set_timer(pygame.USEREVENT, self._speed, True)
+            self._clock = pygame.time.Clock()
+
             ## create a surface (ie canvas) for the game to do drawing
             app_scr_width, app_scr_height = self._snake_game.get_screen_size()
             self._surface = pygame.display.set_mode((app_scr_width,app_scr_height))
+            GameWorld.prepare_images() # now the display format is known
 
             ## hook a text widget to the root
             self._text = tk.Text(self._tk_root, height=18, width=50)
@@ -125,21 +145,7 @@ class MainApp:
                 self.report_outcome_to_AI(outcome)
                 if outcome==GameOutcome.CRASHED_TO_WALL or \
                    outcome==GameOutcome.CRASHED_TO_BODY:
-                    score = self._snake_game.get_score()
-                    if score > self._high_score: self._high_score = score
-                    self._round += 1
-                    print("round, %d, score, %d"%(self._round,score))
-                    if self._pause_mode and self._gui_mode:
-                        if msgbox.askyesno( \
-                            "Your Snake Crashed", \
-                            "Game Over\nDo you want to play again?"):
-                            self._snake_game.restart()
-                            self._snake_game.set_pause(True)
-                        else:
-                            self._running = False
-                    else:
-                        self._snake_game.restart() # always continue for no display
-                        self._snake_game.set_pause(False) # and don't pause
+                    self.on_crash()
                 elif outcome==GameOutcome.REACHED_FOOD:
                     pass # Food eaten, we can do something here
                          # but for now, we do nothing
@@ -147,6 +153,31 @@ class MainApp:
             pygame.time.set_timer(pygame.USEREVENT, self._speed, True)
         elif event.type == pygame.KEYDOWN or event.type == pygame.KEYUP:
             self.on_key_event(event)
+        elif event.type == pygame.VIDEOEXPOSE \
+             or event.type == pygame.WINDOWEXPOSED:
+            # the window needs repainting, e.g. restored or uncovered,
+            # only changes are painted otherwise, so paint it all
+            self._snake_game.invalidate_paint()
+
+    def on_crash(self):
+        ## record the score of this round
+        score = self._snake_game.get_score()
+        if score > self._high_score: self._high_score = score
+        self._round += 1
+        print("round, %d, score, %d"%(self._round,score))
+
+        ## start the next round
+        if self._pause_mode and self._gui_mode:
+            if msgbox.askyesno( \
+                "Your Snake Crashed", \
+                "Game Over\nDo you want to play again?"):
+                self._snake_game.restart()
+                self._snake_game.set_pause(True)
+            else:
+                self._running = False
+        else:
+            self._snake_game.restart() # always continue for no display
+            self._snake_game.set_pause(False) # and don't pause
 
     def on_key_event(self, event):
         if not self._gui_mode: return # skip input event if no GUI
@@ -173,36 +204,13 @@ class MainApp:
                     pass # do nothing for key_up
 
     def _get_state(self) -> SystemState:
-        ## fill the input system state accordingly
-        state = SystemState()
-        snake_x, snake_y = self._snake_game.get_snake_loc()
-        food_x, food_y = self._snake_game.get_food_loc()
-
-        ## 1. moving direction
-        state.dir_x, state.dir_y = self._snake_game.get_direction()
-
-        ## 2. food direction
-        if food_x > snake_x:   state.food_east = True
-        elif food_x < snake_x: state.food_west = True
-        if food_y > snake_y:   state.food_south = True
-        elif food_y < snake_y: state.food_north = True
-
-        ## 3. vision around the snake (one ring vision)
-        def macro_set(x,y): ## macro-like function
-            obj = self._snake_game.get_object_at(x,y)
-            return 0 if obj==SnakeVision.SPACE else \
-                  +1 if obj==SnakeVision.FOOD  else \
-                  -1
-        state.obj_north = macro_set(snake_x,snake_y-1)
-        state.obj_south = macro_set(snake_x,snake_y+1)
-        state.obj_east = macro_set(snake_x+1,snake_y)
-        state.obj_west = macro_set(snake_x-1,snake_y)
-        state.obj_north_east = macro_set(snake_x+1,snake_y-1)
-        state.obj_north_west = macro_set(snake_x-1,snake_y-1)
-        state.obj_south_east = macro_set(snake_x+1,snake_y+1)
-        state.obj_south_west = macro_set(snake_x-1,snake_y+1)
-
-        return state
+        ## the state is the same until the game steps again, so reuse it
+        step = self._snake_game.get_step_counter()
+        if self._state_step!=step:
+            ## the algorithm builds its own system state from the game
+            self._state_cache = self._algo.build_state(self._snake_game)
+            self._state_step = step
+        return self._state_cache
 
     def make_a_move(self):
         ## run the algo based on the system state
@@ -215,68 +223,69 @@ class MainApp:
     def on_paint(self):
         if not self._gui_mode: return # skip if display is OFF
 
-        ## get the game to do the drawing first
-        self._snake_game.do_paint(self._surface, self._high_score)
-        pygame.display.update()
-
-        ## calculate fps
-        self._clock.tick(self._game_default_fps) # fps setting
-        self._game_frame += 1
-        if self._game_frame%10 == 0:
-            t = pygame.time.get_ticks()
-            self._game_fps = (float(10)*1000.0)/(t-self._game_ticks)
-            self._game_ticks = t
-            self._game_frame = 0
-
-        ## print debugging info
-        self._text.delete('1.0', tk.END)
-        self._text.insert('1.0', "\n"*15)
-        self._text.insert('1.0', "%5.1f FPS"%self._game_fps)
-        self._text.insert('3.0', "        ")
-        self._text.insert('4.0', "   +---+")
-        self._text.insert('5.0', "   |   |")
-        self._text.insert('6.0', "   |   |   ")
-        self._text.insert('7.0', "   |   |")
-        self._text.insert('8.0', "   +---+")
-        self._text.insert('9.0', "        ")
-        self._text.insert('12.0',"state="+self._algo.state_str(self._get_state()))
-        self._text.insert('14.0',self._algo.get_name())
-
-        ## get & print snake's vision
-        objlist = { SnakeVision.WALL : "W", \
-                    SnakeVision.FOOD : "o", \
-                    SnakeVision.BODY : "S", \
-                    SnakeVision.HEAD : "H", \
-                    SnakeVision.SPACE : " ", \
-                    SnakeVision.OUTOFSCOPE : " " }
+        ## get the game to do the drawing first, only the changed parts
+        ## are painted and pushed to the display
+        rects = self._snake_game.do_paint_incremental(self._surface, 
+                                                      self._high_score)
+        if rects: pygame.display.update(rects)
+
+        ## calculate fps, only while the game is running
+        paused = self._snake_game.get_pause_status()
+        if not paused:
+            if self._game_paused: # just resumed, restart the measurement
+                self._game_ticks = pygame.time.get_ticks()
+                self._game_frame = 0
+            self._clock.tick(self._game_default_fps) # fps setting
+            self._game_frame += 1
+            if self._game_frame%10 == 0:
+                t = pygame.time.get_ticks()
+                self._game_fps = (float(10)*1000.0)/(t-self._game_ticks)
+                self._game_ticks = t
+                self._game_frame = 0
+        self._game_paused = paused
+
+        ## print debugging info, only a few times per second as
+        ## rebuilding the tk widget is slow
+        t = pygame.time.get_ticks()
+        if t < self._tk_next_ticks: return
+        self._tk_next_ticks = t + self._tk_update_ms
+
+        ## get snake's vision
         snake_x, snake_y = self._snake_game.get_snake_loc()
-        for x in range(-1,2):
-            for y in range(-1,2):
-                obj = objlist[self._snake_game.get_object_at(snake_x+x, snake_y+y)]
-                self._text.delete(str(y+6)+"."+str(x+5))
-                self._text.insert(str(y+6)+"."+str(x+5), obj)
+        vision = ["".join(_OBJ_CHARS[self._snake_game.get_object_at(snake_x+x, snake_y+y)]
+                          for x in range(-1,2)) for y in range(-1,2)]
 
-        ## get & print where the food is
+        ## get where the food is
         food_x, food_y = self._snake_game.get_food_loc()
-        if food_x > snake_x:
-            self._text.delete("6.10")
-            self._text.insert("6.10", ">")
-        elif food_x < snake_x:
-            self._text.delete("6.2")
-            self._text.insert("6.2", "<")
-        if food_y > snake_y:
-            self._text.delete("9.5")
-            self._text.insert("9.5", "v")
-        elif food_y < snake_y:
-            self._text.delete("3.5")
-            self._text.insert("3.5", "^")
-
-        ## print snake's moving direction
+        food_w = "<" if food_x < snake_x else " "
+        food_e = ">" if food_x > snake_x else " "
+        food_n = "^" if food_y < snake_y else " "
+        food_s = "v" if food_y > snake_y else " "
+
+        ## get snake's moving direction
         x,y = self._snake_game.get_direction()
-        if x==+1: self._text.insert("10.0", "Moving RIGHT")
-        elif x==-1: self._text.insert("10.0", "Moving LEFT")
-        elif y==+1: self._text.insert("10.0", "Moving DOWN")
-        elif y==-1: self._text.insert("10.0", "Moving UP")
+        moving = "Moving RIGHT" if x==+1 else "Moving LEFT" if x==-1 else \
+                 "Moving DOWN" if y==+1 else "Moving UP" if y==-1 else ""
+
+        ## print all lines in one go
+        lines = ["%5.1f FPS"%self._game_fps,
+                 "",
+                 "     %s  "%food_n,
+                 "   +---+",
+                 "   |%s|"%vision[0],
+                 "  %s|%s|  %s"%(food_w,vision[1],food_e),
+                 "   |%s|"%vision[2],
+                 "   +---+",
+                 "     %s  "%food_s,
+                 moving,
+                 "",
+                 "state="+self._algo.state_str(self._get_state()),
+                 "",
+                 self._algo.get_name(),
+                 "",
+                 ""]
+        self._text.delete('1.0', tk.END)
+        self._text.insert('1.0', "\n".join(lines))
 
         ## update tk widget
         self._tk_root.update()
@@ -286,10 +295,21 @@ class MainApp:
  
     def run(self):
         self.on_init()
+        if self._gui_mode:
+            self._run_gui()
+        else:
+            self._run_headless()
+        self._algo.callback_terminating()
+        self.on_exit()
 
-        ## this is the main loop
+    def _run_gui(self):
+        ## this is the main loop, driven by the pygame timer
         while self._running:
             try:
+                if self._snake_game.get_pause_status():
+                    ## nothing moves during pause, so rather than spinning,
+                    ## block until an event (the timer keeps one coming)
+                    self.on_event(pygame.event.wait(self._tk_update_ms))
                 for event in pygame.event.get():
                     self.on_event(event) # process timer/key/mouse events if any
                 self.on_paint()          # paint the game surface
@@ -300,11 +320,25 @@ class MainApp:
                         self._running = False
                     else: 
                         self._user_quitting = False
-            except KeyboardInterrupt: # process [^C], mainly for non-GUI mode
+            except KeyboardInterrupt: # process [^C]
                 print(" exiting...")
                 self._running = False
-        self._algo.callback_terminating()
-        self.on_exit()
+
+    def _run_headless(self):
+        ## this is the main loop without display, it runs the game as fast
+        ## as possible, no timer, no event and no painting
+        game = self._snake_game
+        try:
+            while self._running:
+                self.make_a_move() # ask AI to make a move
+                outcome = game.snake_take_step()
+                self.report_outcome_to_AI(outcome)
+                if outcome==GameOutcome.CRASHED_TO_WALL or \
+                   outcome==GameOutcome.CRASHED_TO_BODY:
+                    self.on_crash()
+        except KeyboardInterrupt: # process [^C]
+            print(" exiting...")
+            self._running = False
 
 '''
 main()
@@ -8,10 +8,16 @@ classes:
 - _GameFood: this is the food in the game (private class).
 '''
 
+# to cope with forward declaration for type annotation
+# the following works for Python 3.7+
+# expect to become a default in Python 3.10
+from __future__ import annotations
 import pygame
 import random
 import enum
-from pygame import Surface
+from collections import deque
+from itertools import islice
+from pygame import Surface, Rect
 from vecint2 import VecInt2
 
 class GameOutcome(enum.Enum):
@@ -31,6 +37,9 @@ class SnakeVision(enum.Enum):
     HEAD  = 5
     OUTOFSCOPE = 6
 
+## SnakeVision indexed by its value, to decode the cells of the grid
+_VISION_OF = {vision.value:vision for vision in SnakeVision}
+
 class GameWorld:
     '''
     This class describe the world of the snake game. The constructor
@@ -53,6 +62,23 @@ class GameWorld:
     _img_snake:Surface = pygame.image.load("img/snake.png")
     _img_head:Surface = pygame.image.load("img/head.png")
     _img_food:Surface = pygame.image.load("img/food.png")
+    _img_prepared: bool = False # converted to the display format?
+
+    @classmethod
+    def prepare_images(cls):
+        '''It converts the images to the pixel format of the display, so
+        that blitting them needs no conversion. Call it once after 
+        `pygame.display.set_mode()`.'''
+        cls._img_wall = cls._img_wall.convert_alpha()
+        cls._img_snake = cls._img_snake.convert_alpha()
+        cls._img_head = cls._img_head.convert_alpha()
+        cls._img_food = cls._img_food.convert_alpha()
+        cls._img_prepared = True
+
+    def _prepare_text(self, img_text:Surface) -> Surface:
+        '''It converts a rendered text to the display format, like 
+        `prepare_images()` does for the images.'''
+        return img_text.convert_alpha() if self._img_prepared else img_text
 
     def __init__(self, width:int, height:int):
         ## setup the size
@@ -63,22 +89,73 @@ class GameWorld:
 
         ## setup game related properties
         self._score: int = 0
-        self._pause: bool = True
+        self._pause: bool = None
+        self.set_pause(True)
+        self._step_counter: int = 0 # counts changes of the game state
 
         ## setup other objects
         self._snake = _GameSnake(self._size)
         self._food = _GameFood(self._size)
 
+        ## cells inside the walls not taken by the snake, and the grid 
+        ## of what is on every cell (SnakeVision values, row by row)
+        self._free_cells: set[tuple[int,int]] = set()
+        self._grid = bytearray(self._size.x*self._size.y)
+        self._reset_cells()
+
+        ## painting resources, created on the first paint since they
+        ## need pygame to be initialized
+        self._font_score: pygame.font.Font = None
+        self._img_score: Surface = None # rendered score text
+        self._img_score_of: (int,int) = None # (score,highscore) rendered
+        self._img_pause: Surface = None # rendered pause text
+        self._img_background: Surface = None # background with the walls
+
+        ## incremental painting, see `do_paint_incremental()`
+        self._img_back: Surface = None # the scene as last painted
+        self._dirty: [(int,int)] = [] # cells changed since last painted
+        self._repaint_all: bool = True # need to repaint the whole scene?
+        self._painted_pause: bool = None # pause status last painted
+
     def restart(self):
         '''It resets the internal variables preparing for a new round of game.'''
         self._score = 0
-        self._pause = True
+        self.set_pause(True)
+        self._step_counter += 1
         self._snake.restart()
         self._food.restart()
+        self._reset_cells()
+        self._dirty.clear()
+        self._repaint_all = True
 
         self.debug_place_food_precisely() ##debugging
 
 
+    def _reset_cells(self):
+        '''It marks all cells inside the walls as free except the ones
+        taken by the snake, and fills the grid with the walls, the food
+        and the snake.'''
+        self._free_cells = {(x,y) for x in range(1,self._size.x-1)
+                                  for y in range(1,self._size.y-1)}
+        for loc in self._snake.get_body_loc():
+            self._free_cells.discard((loc.x,loc.y))
+
+        width, height = self._size.x, self._size.y
+        wall, space = SnakeVision.WALL.value, SnakeVision.SPACE.value
+        self._grid[:] = bytes([wall]*width) \
+                       + bytes([wall]+[space]*(width-2)+[wall])*(height-2) \
+                       + bytes([wall]*width)
+        self._set_cell(self._food.get_loc(), SnakeVision.FOOD)
+        body = self._snake.get_body_loc()
+        for i in range(len(body)-1,-1,-1):
+            self._set_cell(body[i], SnakeVision.BODY if i else SnakeVision.HEAD)
+
+    def _set_cell(self, loc:VecInt2, obj:SnakeVision):
+        '''It records `obj` on the grid at `loc`, if `loc` is inside the
+        walls. The walls are never overwritten.'''
+        if 0<loc.x<self._size.x-1 and 0<loc.y<self._size.y-1:
+            self._grid[loc.y*self._size.x+loc.x] = obj.value
+
     def debug_place_food_precisely(self):
         return
         #####debugging:place food near the snake
@@ -98,23 +175,10 @@ class GameWorld:
         '''It return what object is at game location (x,y). Note that
         game location (0,0) is the top left corner of the wall, and 
         (self._size-1,self._size-1) is the bottom right corner of the wall.'''
-        loc = VecInt2(x,y)
-        if x<0 or x>self._size.x-1:
-            return SnakeVision.OUTOFSCOPE
-        elif y<0 or y>self._size.y-1:
-            return SnakeVision.OUTOFSCOPE
-        elif x==0 or x==self._size.x-1:
-            return SnakeVision.WALL
-        elif y==0 or y==self._size.y-1:
-            return SnakeVision.WALL
-        elif self._snake.is_on_body(loc):
-            return SnakeVision.BODY
-        elif self._snake.is_on_head(loc):
-            return SnakeVision.HEAD
-        elif self._food.get_loc().is_same_loc_as(loc):
-            return SnakeVision.FOOD
-        else:
-            return SnakeVision.SPACE
+        width = self._size.x
+        if 0<=x<width and 0<=y<self._size.y:
+            return _VISION_OF[self._grid[y*width+x]]
+        return SnakeVision.OUTOFSCOPE
 
     def get_screen_size(self) -> (int,int):
         '''It returns the screen size in pixels.'''
@@ -122,8 +186,13 @@ class GameWorld:
 
     def get_direction(self) -> (int,int):
         '''It returns the current moving direction of the snake.'''
-        movement = self._snake.get_direction()
-        return (movement.x,movement.y)
+        return self._snake.get_direction()
+
+    def get_step_counter(self) -> int:
+        '''It returns a counter which increases whenever the snake moves,
+        changes its direction or the game restarts. Anything derived from
+        the game state stays valid while the counter is unchanged.'''
+        return self._step_counter
 
     def get_score(self) -> int:
         '''It returns the current score of the game.'''
@@ -131,131 +200,244 @@ class GameWorld:
 
     def get_snake_loc(self) -> (int,int):
         '''It returns the current location of the snake's head.'''
-        x = self._snake.get_head_loc().x
-        y = self._snake.get_head_loc().y
-        return (x,y)
+        head = self._snake.get_head_loc()
+        return (head.x,head.y)
 
     def get_food_loc(self) -> (int,int):
         '''It returns the current food location.'''
-        x = self._food.get_loc().x
-        y = self._food.get_loc().y
-        return (x,y)
-
-    def _get_pixel_loc(self, pt:VecInt2) -> VecInt2:
-        '''It returns the pixel location given game location `pt`.'''
-        pixel_loc = VecInt2()
-        pixel_loc.x = self._margin_size + pt.x*self._block_size
-        pixel_loc.y = self._margin_size + pt.y*self._block_size
-        return pixel_loc
+        food = self._food.get_loc()
+        return (food.x,food.y)
+
+    def _paint_background(self, surface:Surface):
+        '''It paints a white background and puts the walls on `surface`.'''
+        margin, block = self._margin_size, self._block_size
+        width, height = self._size.x, self._size.y
+        img_wall = self._img_wall
+        left: int = margin
+        right: int = margin + (width-1)*block
+        top: int = margin
+        bottom: int = margin + (height-1)*block
+        surface.fill((255, 255, 255))
+        ## 1. top & bottom walls
+        walls = [(img_wall, (margin+i*block, y)) 
+                 for y in (top,bottom) for i in range(width)]
+        ## 2. left & right walls
+        walls += [(img_wall, (x, margin+j*block))
+                  for j in range(1,height-1) for x in (left,right)]
+        surface.blits(walls, doreturn=False)
 
     def do_paint(self, surface:Surface, highscore:int):
         '''It draws the game on the given surface.'''
-        ## paint a white background and put the walls
-        x = self._margin_size
-        y = self._margin_size
-        left: int = self._margin_size
-        right: int = self._margin_size + (self._size.x-1) * self._block_size
-        surface.fill((255, 255, 255))
-        ## 1. top walls
-        for _ in range(self._size.x):
-            surface.blit(self._img_wall, (x,y))
-            x += self._block_size
-        ## 2. left & right walls
-        y += self._block_size
-        for _ in range(self._size.y-2):
-            surface.blit(self._img_wall, (left,y)) # left wall
-            surface.blit(self._img_wall, (right,y)) # right wall
-            y += self._block_size
-        ## 3. bottom walls
-        x = self._margin_size
-        for _ in range(self._size.x):
-            surface.blit(self._img_wall, (x,y)) 
-            x += self._block_size
+        ## paint the background and the walls, they never change, so 
+        ## they are painted once on a surface and copied from there
+        if self._img_background is None:
+            self._img_background = Surface(surface.get_size(), 0, surface)
+            self._paint_background(self._img_background)
+        surface.blit(self._img_background, (0,0))
 
         ## write score & high_score
-        score: str = "SCORE: "+str(self._score).ljust(5)
-        score += "HIGHEST SCORE: "+str(highscore)
-        img_text:Surface = pygame.font.SysFont('Consolas',18,True).render(score,True,(0,0,0))
-        x = int((self._screen_size.x - img_text.get_width())/2)
-        y += 2*self._block_size
-        surface.blit(img_text, (x,y))
+        self._paint_score(surface, highscore)
 
         ## draw the food
+        margin, block = self._margin_size, self._block_size
         pt = self._food.get_loc()
-        surface.blit(self._img_food, self._get_pixel_loc(pt).xy())
+        surface.blit(self._img_food, (margin+pt.x*block, margin+pt.y*block))
 
-        ## draw the snake
-        for i in range(len(self._snake.get_body_loc())):
-            pt_list = self._snake.get_body_loc()
-            if i==0:
-                surface.blit(self._img_head, self._get_pixel_loc(pt_list[i]).xy())
-            else:
-                surface.blit(self._img_snake, self._get_pixel_loc(pt_list[i]).xy())
+        ## draw the snake, the head first then the rest, in one call
+        pt_list = self._snake.get_body_loc()
+        img_head, img_snake = self._img_head, self._img_snake
+        surface.blits([(img_snake if i else img_head, 
+                        (margin+pt.x*block, margin+pt.y*block))
+                       for i,pt in enumerate(pt_list)], doreturn=False)
 
         ## show pause if needed
         if self._pause:
-            img_text = pygame.font.SysFont('Consolas',36,True) \
-                                  .render('PAUSE',True,(128,0,0))
+            if self._img_pause is None:
+                self._img_pause = self._prepare_text(
+                                    pygame.font.SysFont('Consolas',36,True) \
+                                               .render('PAUSE',True,(128,0,0)))
+            img_text = self._img_pause
             x = int((self._screen_size.x - img_text.get_width())/2)
             y = int((self._screen_size.y - img_text.get_height())/2)
             surface.blit(img_text, (x,y))
 
+    def _paint_score(self, surface:Surface, highscore:int) -> Rect:
+        '''It paints the score & high_score below the walls, and returns
+        the rectangle it painted.'''
+        ## render it again only if changed
+        if self._img_score_of!=(self._score,highscore):
+            if self._font_score is None:
+                self._font_score = pygame.font.SysFont('Consolas',18,True)
+            score: str = "SCORE: "+str(self._score).ljust(5)
+            score += "HIGHEST SCORE: "+str(highscore)
+            self._img_score = self._prepare_text(
+                                self._font_score.render(score,True,(0,0,0)))
+            self._img_score_of = (self._score,highscore)
+
+        ## clear the area below the walls, then write the score
+        top = self._margin_size + self._size.y*self._block_size
+        rect = Rect(0, top, self._screen_size.x, self._screen_size.y-top)
+        surface.blit(self._img_background, rect, rect)
+        img_text:Surface = self._img_score
+        x = int((self._screen_size.x - img_text.get_width())/2)
+        y = top + self._block_size
+        surface.blit(img_text, (x,y))
+        return rect
+
+    def _paint_cell(self, surface:Surface, x:int, y:int) -> Rect:
+        '''It paints the game location (x,y) again, and returns the 
+        rectangle it painted.'''
+        margin, block = self._margin_size, self._block_size
+        rect = Rect(margin+x*block, margin+y*block, block, block)
+        blit = surface.blit
+        blit(self._img_background, rect, rect)
+
+        ## same order as `do_paint()`: food, head then body
+        obj = self._grid[y*self._size.x+x]
+        if obj==SnakeVision.FOOD.value:
+            blit(self._img_food, rect)
+        head = self._snake.get_head_loc()
+        if x==head.x and y==head.y:
+            blit(self._img_head, rect)
+        if obj==SnakeVision.BODY.value:
+            blit(self._img_snake, rect)
+        return rect
+
+    def do_paint_incremental(self, surface:Surface, highscore:int) -> [Rect]:
+        '''It draws the game on the given surface, same as `do_paint()`, 
+        but only repaints the cells changed since the last call. The scene
+        is kept on a back buffer, the changed parts are copied to `surface`.
+
+        Returns
+        -------
+        [Rect]
+            The rectangles updated on `surface`, e.g. to pass to 
+            `pygame.display.update()`. It is empty if nothing changed.
+        '''
+        if self._img_back is None:
+            self._img_back = Surface(surface.get_size(), 0, surface)
+            self._repaint_all = True
+        back = self._img_back
+
+        ## repaint the whole scene after a restart or a pause change
+        if self._repaint_all or self._painted_pause!=self._pause:
+            self.do_paint(back, highscore)
+            self._dirty.clear()
+            self._repaint_all = False
+            self._painted_pause = self._pause
+            surface.blit(back, (0,0))
+            return [back.get_rect()]
+
+        ## otherwise, only the changed cells and the score if changed
+        rects = [self._paint_cell(back, x, y) for x,y in self._dirty]
+        self._dirty.clear()
+        if self._img_score_of!=(self._score,highscore):
+            rects.append(self._paint_score(back, highscore))
+        surface.blits([(back, rect, rect) for rect in rects], doreturn=False)
+        return rects
+
+    def invalidate_paint(self):
+        '''It makes the next `do_paint_incremental()` repaint the whole 
+        scene, e.g. when the window has been exposed and its content is
+        lost.'''
+        self._repaint_all = True
+
     def snake_change_dir(self, x:int, y:int):
-        '''Use this method to change the snake moving direction.'''
-        if self._pause: return
+        '''Use this method to change the snake moving direction. It does
+        nothing during PAUSE.'''
         self._snake.do_change_dir(x,y)
+        self._step_counter += 1
+
+    def _snake_change_dir_paused(self, x:int, y:int):
+        '''It replaces `snake_change_dir()` during PAUSE.'''
+        pass # do nothing during PAUSE
+
+    def _snake_take_step_paused(self) -> GameOutcome:
+        '''It replaces `snake_take_step()` during PAUSE.'''
+        return GameOutcome.PAUSE # do nothing during PAUSE
 
     def snake_take_step(self) -> GameOutcome:
-        '''Use this method to trigger the snake to move one step.'''
-        ## do nothing during PAUSE
-        if self._pause: 
-            return GameOutcome.PAUSE
-
-        ## move the snake
-        self._snake.do_move()
-
-        ## check the outcome
-        snake_head: VecInt2 = self._snake.get_head_loc()
-        if snake_head.x==0 or snake_head.x==self._size.x-1 \
-           or snake_head.y==0 or snake_head.y==self._size.y-1:
+        '''Use this method to trigger the snake to move one step. It does 
+        nothing but returns `GameOutcome.PAUSE` during PAUSE.'''
+        ## move the snake, and update the free cells & the grid
+        new_head, old_tail = self._snake.do_move()
+        self._step_counter += 1
+        if old_tail is not None:
+            self._free_cells.add((old_tail.x,old_tail.y))
+            self._set_cell(old_tail, SnakeVision.SPACE)
+        self._free_cells.discard((new_head.x,new_head.y))
+        body = self._snake.get_body_loc()
+        if len(body)>1:
+            self._set_cell(body[1], SnakeVision.BODY) # was the head
+
+        ## remember the cells to repaint, if nobody paints them for a 
+        ## while (e.g. no display), just repaint all when it happens
+        dirty = self._dirty
+        if len(dirty)>64:
+            dirty.clear()
+            self._repaint_all = True
+        if old_tail is not None:
+            dirty.append((old_tail.x,old_tail.y))
+        if len(body)>1:
+            dirty.append((body[1].x,body[1].y))
+        dirty.append((new_head.x,new_head.y))
+
+        ## check the outcome, by what was on the cell the head moved to
+        snake_head: VecInt2 = new_head
+        if snake_head.x<=0 or snake_head.x>=self._size.x-1 \
+           or snake_head.y<=0 or snake_head.y>=self._size.y-1:
             ## if crashed, do the following
             return GameOutcome.CRASHED_TO_WALL
-        elif self._snake.is_on_body(snake_head):
+        hit = self._grid[snake_head.y*self._size.x+snake_head.x]
+        if hit==SnakeVision.BODY.value: # a body crash shows BODY
             ## if crashed, do the following
             return GameOutcome.CRASHED_TO_BODY
-        elif snake_head.is_same_loc_as(self._food.get_loc()):
+        self._set_cell(snake_head, SnakeVision.HEAD)
+        if hit==SnakeVision.FOOD.value:
             ## if food eaten, do the following
             self._score += 1
             #####if self._snake.get_body_len()==1: ##debugging:limit grow
             self._snake.do_grow() ##debugging:mask for no grow
-            while True:
-                new_food_loc = self._food.do_place_random()
-                if self._snake.is_on_body(new_food_loc):
-                    continue # food on the body, try again
-                elif self._snake.is_on_head(new_food_loc):
-                    continue # food on the head, try again
-                elif self._snake.get_head_loc().distance_to(new_food_loc)<2.0:
-                    continue # food too close to the head, try again
-                else: break # otherwise, done & break
+            ## place the food on a free cell, not next to the head;
+            ## if no such cell left, any free cell will do
+            near_head = {(snake_head.x+x,snake_head.y+y) 
+                             for x in range(-1,2) for y in range(-1,2)}
+            self._food.do_place_random((self._free_cells - near_head) 
+                                       or self._free_cells)
+            if self.get_object_at(*self.get_food_loc())==SnakeVision.SPACE:
+                self._set_cell(self._food.get_loc(), SnakeVision.FOOD)
+            self._dirty.append(self.get_food_loc())
             self.debug_place_food_precisely() ##debugging
             return GameOutcome.REACHED_FOOD
         return GameOutcome.RUNNING
 
     def toggle_pause(self) -> bool:
         '''Use this method to toggle the pause status.'''
-        self._pause = not self._pause
+        self.set_pause(not self._pause)
         return self._pause
 
     ## method to set pause status
     def set_pause(self, pause:bool):
         '''Use this method to set pause status.'''
         self._pause = pause
+        ## during PAUSE, the instance attributes below hide the methods 
+        ## of the class, so the methods need not check the pause status
+        if pause:
+            self.snake_change_dir = self._snake_change_dir_paused
+            self.snake_take_step = self._snake_take_step_paused
+        else:
+            self.__dict__.pop('snake_change_dir', None)
+            self.__dict__.pop('snake_take_step', None)
 
     ## return the pause status
     def get_pause_status(self) -> bool:
         '''Use this method get the pause status.'''
         return self._pause
 
+## the moving directions of the snake, and their index in `_DIRS`
+_DIRS = ((0,-1),(1,0),(0,1),(-1,0)) # up, right, down, left
+_DIR_INDEX = {xy:i for i,xy in enumerate(_DIRS)}
+
 class _GameSnake:
     '''
     This is an internal class describing the behaviour of the snake in the 
@@ -264,34 +446,34 @@ class _GameSnake:
 
     def __init__(self, size:VecInt2):
         self._size: VecInt2 = size
-        self._body: [VecInt2] = []
-        self._movement: VecInt2 = VecInt2(0,0)
+        self._body: deque[VecInt2] = deque() # the head is at the left
+        self._dir_idx: int = 0 # moving direction, index of `_DIRS`
+        self._pending_growth: int = 0 # blocks to grow on the next moves
         self.restart() # initialization
 
     def restart(self):
         ## initialize the snake near the bottom center
         self._body.clear()
+        self._pending_growth = 0
         x = int(self._size.x/2)
         y = self._size.y - 3
-        self._body.append(VecInt2(x,y))
+        self._body.appendleft(VecInt2(x,y))
 
         ## initialize the movement to upward
-        self._movement.set_xy(0,-1)
+        self._dir_idx = 0
 
     def is_on_body(self, loc:VecInt2) -> bool:
-        '''Use it to check if `loc` is on the snake body.'''
-        for i in range(len(self._body)):
-            if i==0: continue # skip the head
-            if loc.is_same_loc_as(self._body[i]):
-                return True
-        return False
+        '''Use it to check if `loc` is on the snake body. The game world
+        looks up its grid instead, this scan is for other uses.'''
+        return loc in islice(self._body,1,None) # skip the head
 
     def is_on_head(self, loc:VecInt2) -> bool:
         '''Use it to check if `loc` is on the snake head.'''
-        return loc.is_same_loc_as(self._body[0])
+        return loc==self._body[0]
 
-    def get_body_loc(self) -> [VecInt2]:
-        '''Use it to get the snake body's location info in a list of VecInt2.'''
+    def get_body_loc(self) -> deque[VecInt2]:
+        '''Use it to get the snake body's location info in a deque of VecInt2,
+        starting from the head.'''
         return self._body
 
     def get_body_len(self) -> int:
@@ -302,26 +484,37 @@ class _GameSnake:
         '''Use it to get the head location of the snake.'''
         return self._body[0]
 
-    def get_direction(self) -> VecInt2:
+    def get_direction(self) -> (int,int):
         '''It returns the moving direction of the snake.'''
-        return self._movement
-
-    def do_move(self):
-        '''Call this method to trigger the snake to move one step.'''
-        for i in range(len(self._body)-1,0,-1):
-            self._body[i].set_to(self._body[i-1])
-        self._body[0].move(self._movement)
+        return _DIRS[self._dir_idx]
+
+    def do_move(self) -> (VecInt2,VecInt2):
+        '''Call this method to trigger the snake to move one step. It returns
+        the new head location and the tail location it left, or None as 
+        the tail location if the snake grew.'''
+        ## the new head goes in front, the tail leaves unless growing
+        head = self._body[0]
+        dx, dy = _DIRS[self._dir_idx]
+        self._body.appendleft(VecInt2(head.x+dx, head.y+dy))
+        if self._pending_growth:
+            self._pending_growth -= 1
+            tail = None
+        else:
+            tail = self._body.pop()
+        return (self._body[0], tail)
 
     def do_change_dir(self, x:int, y:int):
-        '''Call this method to change the snake's moving direction.'''
-        self._movement.set_xy(x,y)
+        '''Call this method to change the snake's moving direction. If
+        (x,y) is not one of the four directions in `_DIRS`, e.g. (0,0), 
+        the snake keeps its current direction.'''
+        self._dir_idx = _DIR_INDEX.get((x,y), self._dir_idx)
 
     def do_grow(self):
         '''Call this method to grow the snake by one block size. In the game,
-        the snake grows after eating the food.'''
-        x = self._body[-1].x
-        y = self._body[-1].y
-        self._body.append(VecInt2(x,y)) # append the body by 1 block
+        the snake grows after eating the food. The tail stays where it is
+        on the next move, so the body becomes 1 block longer. Growths 
+        called before the next move add up, one per following move.'''
+        self._pending_growth += 1
 
 
 class _GameFood:
@@ -332,19 +525,26 @@ class _GameFood:
     def __init__(self, size:VecInt2):
         self._size:VecInt2 = size
         self._location = VecInt2(0,0)
+        ## own random generator, seeded from the global one so that
+        ## `random.seed()` still reproduces the game
+        self._rng = random.Random(random.getrandbits(32))
+        ## exclusive upper bounds of the initial food location
+        self._max_x: int = size.x-1
+        self._max_y: int = int((size.y-2)/2)+1
         self.restart()
 
     def restart(self):
         # place the food on the top half initially
-        x = random.randint(1, self._size.x-2)
-        y = random.randint(1, int((self._size.y-2)/2))
+        x = self._rng.randrange(1, self._max_x)
+        y = self._rng.randrange(1, self._max_y)
         self._location.set_xy(x,y)
 
-    def do_place_random(self) -> VecInt2:
-        '''Use this method to place the food at a random location.'''
-        x = random.randint(1, self._size.x-2)
-        y = random.randint(1, self._size.y-2)
-        self._location.set_xy(x,y)
+    def do_place_random(self, cells:set[tuple[int,int]]) -> VecInt2:
+        '''Use this method to place the food at a random location picked 
+        from `cells`, a set of (x,y). The food stays if `cells` is empty.'''
+        if cells:
+            x, y = self._rng.choice(tuple(cells))
+            self._location.set_xy(x,y)
         return self._location
 
     def get_loc(self) -> VecInt2:
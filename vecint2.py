@@ -13,6 +13,7 @@ class VecInt2:
     '''
     This class provides a vector object containing two integers.
     '''
+    __slots__ = ('x', 'y')
 
     def __init__(self, x:int=0, y:int=0):
         self.x: int = x
@@ -26,6 +27,17 @@ class VecInt2:
         '''This is a Subtraction operation.'''
         return VecInt2(self.x-other.x, self.y-other.y)
 
+    def __eq__(self, other) -> bool:
+        '''It checks if the object has the same (x,y) as `other`.'''
+        if not isinstance(other, VecInt2):
+            return NotImplemented
+        return self.x==other.x and self.y==other.y
+
+    def __hash__(self) -> int:
+        '''It hashes the (x,y) so that the object can be a dict key or
+        a set member. Do not change it while it is used as a key.'''
+        return hash((self.x,self.y))
+
     def set_xy(self, x:int, y:int):
         '''Use this method to directly set its (x,y).'''
         self.x = x
@@ -43,15 +55,20 @@ class VecInt2:
 
     def distance_to(self, other:VecInt2) -> float:
         '''It measures the distance between this object and `other`.'''
-        p2: VecInt2 = self - other
-        return float(math.sqrt(p2.x**2 + p2.y**2))
+        return math.sqrt(self.distance_sq_to(other))
+
+    def distance_sq_to(self, other:VecInt2) -> int:
+        '''It measures the squared distance between this object and `other`. 
+        Use it to compare distances without taking the square root.'''
+        dx = self.x - other.x
+        dy = self.y - other.y
+        return dx*dx + dy*dy
 
     def xy(self):
         '''It returns a tuple (x,y) describing this object.'''
         return (self.x,self.y)
 
     def is_same_loc_as(self, other:VecInt2) -> bool:
-        '''It checks if the object has the same (x,y) as `other`.'''
-        if self.x==other.x and self.y==other.y:
-            return True
-        return False
+        '''It checks if the object has the same (x,y) as `other`. It is
+        the same as `self==other`.'''
+        return self.x==other.x and self.y==other.y